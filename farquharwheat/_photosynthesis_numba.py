@@ -0,0 +1,389 @@
+# -*- coding: latin-1 -*-
+
+from __future__ import division  # use '//' to do integer division
+from math import sqrt, exp
+from typing import NamedTuple
+
+"""
+    farquharwheat._photosynthesis_numba
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Scalar kernels of the Farquhar photosynthesis model and of its coupled (Ci, Ts)
+    fixed-point loop, written as free functions of plain floats so that they can be
+    JIT-compiled by Numba. Numba is optional: when it is not installed the kernels run
+    as regular Python code and compute exactly the same values.
+
+    All the model constants are passed to the kernels in two NamedTuples, built once by
+    :mod:`farquharwheat.model` from :mod:`farquharwheat.parameters`. This keeps dict
+    lookups and module attribute accesses out of the hot path; Numba compiles NamedTuples
+    of floats like plain tuples, and the named construction protects the field order.
+
+    :copyright: Copyright 2014-2026 INRA-ECOSYS, see AUTHORS.
+    :license: see LICENSE for details.
+
+"""
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Fallback decorator used when Numba is not installed: return the function unchanged."""
+        if args and callable(args[0]):
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
+
+
+class PhotosynthesisConstants(NamedTuple):
+    """The constants of the FCB photosynthesis model used by :func:`_photosynthesis_kernel`,
+    extracted by :func:`farquharwheat.model._extract_photosynthesis_constants`."""
+    KC25: float
+    KO25: float
+    GAMMA25: float
+    O2: float
+    THETA: float
+    J_expo: float
+    J_A: float
+    J_B: float
+    Aj_A: float
+    Aj_B: float
+    Vomax_A: float
+    Ap_A: float
+    Rd_A: float
+    Rd_exp_coeff: float
+    WSC_min: float
+    Inhibition_max: float
+    K_Inhibition: float
+    S_Vcmax25: float
+    SNmin_Vcmax25: float
+    S_Jmax25: float
+    SNmin_Jmax25: float
+    S_TPU25: float
+    SNmin_TPU25: float
+    S_Rdark25: float
+    SNmin_Rdark25: float
+    S_alpha: float
+    beta: float
+    dHa_Kc: float
+    dHa_Ko: float
+    dHa_Gamma: float
+    dHa_Vcmax: float
+    dHa_Jmax: float
+    dHa_TPU: float
+    dHa_Rdark: float
+    dHd_Vcmax: float
+    dHd_Jmax: float
+    dHd_TPU: float
+    dS_Vcmax: float
+    dS_Jmax: float
+    dS_TPU: float
+    fdn_Vcmax: float
+    fdn_Jmax: float
+    fdn_TPU: float
+    Tref: float
+    inv_R_kJ: float
+    KELVIN_DEGREE: float
+
+
+class RunConstants(NamedTuple):
+    """The stomatal conductance, CO2 balance, energy balance and convergence constants
+    used by :func:`_run_kernel`, extracted by :func:`farquharwheat.model._extract_run_constants`."""
+    GSMIN: float
+    GB: float
+    K_Cs: float
+    gsw_gs_CO2: float
+    Ci_A: float
+    delta1: float
+    delta2: float
+    R: float
+    PATM: float
+    s_A: float
+    s_B: float
+    s_C: float
+    RHOCP: float
+    LAMBDA: float
+    GAMMA_PSY: float
+    DELTA_CONVERGENCE: float
+    Ci_init_ratio: float
+
+
+@njit(cache=True, fastmath=True)
+def _f_temp_activation_only(p25, deltaHa, Tk, Tref, inv_R_kJ):
+    """Temperature response of a photosynthetic parameter with activation term only.
+
+    :param float p25: parameter value at 25 degree C
+    :param float deltaHa: enthalpie of activation (kJ mol-1)
+    :param float Tk: organ temperature (K)
+    :param float Tref: reference temperature (K)
+    :param float inv_R_kJ: inverse of the gas constant expressed in kJ, 1/(R*1E-3) (mol K kJ-1)
+
+    :return: parameter value at organ temperature
+    :rtype: float
+    """
+    return p25 * exp((deltaHa * (Tk - Tref) * inv_R_kJ) / (Tref * Tk))
+
+
+@njit(cache=True, fastmath=True)
+def _f_temp_with_deact(p25, deltaHa, deltaHd, deltaS, f_deact_num, Tk, Tref, inv_R_kJ):
+    """Temperature response of a photosynthetic parameter with activation and deactivation terms.
+
+    :param float p25: parameter value at 25 degree C
+    :param float deltaHa: enthalpie of activation (kJ mol-1)
+    :param float deltaHd: enthalpie of deactivation (kJ mol-1)
+    :param float deltaS: entropy term (kJ mol-1 K-1)
+    :param float f_deact_num: precomputed numerator of the deactivation fraction, 1 + exp((Tref*deltaS - deltaHd)/(Tref*R*1E-3))
+    :param float Tk: organ temperature (K)
+    :param float Tref: reference temperature (K)
+    :param float inv_R_kJ: inverse of the gas constant expressed in kJ, 1/(R*1E-3) (mol K kJ-1)
+
+    :return: parameter value at organ temperature
+    :rtype: float
+    """
+    f_activation = exp((deltaHa * (Tk - Tref) * inv_R_kJ) / (Tref * Tk))
+    # No expm1/log1p rewrite needed: over the physical temperature range the deactivation
+    # exponent stays within about [-3, 5], far from the regime where 1 + exp(x) loses precision
+    f_deactivation = f_deact_num / (1 + exp((deltaS - deltaHd / Tk) * inv_R_kJ))
+    return p25 * f_activation * f_deactivation
+
+
+@njit(cache=True, fastmath=True)
+def _photosynthesis_kernel(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, Ci, temperature_factors, constants):
+    """Compute Ag, An and Rd for one element. Same equations as
+    :func:`farquharwheat.model.calculate_photosynthesis`, with the temperature-response
+    factors precomputed by :func:`farquharwheat.model._temperature_factors` and all the
+    model constants received in the :class:`PhotosynthesisConstants` tuple (see
+    :func:`farquharwheat.model._extract_photosynthesis_constants`).
+
+    :param float PAR: PAR absorbed (�mol m-2 s-1)
+    :param float surfacic_nitrogen: surfacic nitrogen content (g m-2)
+    :param bool NSC_Retroinhibition: if True, Ag is inhibited by surfacic NSC
+    :param float surfacic_NSC: surfacic content of NSC (�mol C m-2)
+    :param float Ci: internal CO2 (�mol mol-1)
+    :param numpy.ndarray temperature_factors: the temperature-response factors of the photosynthetic
+        parameters at the organ temperature, indexed from Kc to Rdark
+
+    :return: Ag (�mol m-2 s-1), An (�mol m-2 s-1), Rd (�mol m-2 s-1)
+    :rtype: (float, float, float)
+    """
+    (KC25, KO25, GAMMA25, O2, THETA,
+     J_expo, J_A, J_B, Aj_A, Aj_B, Vomax_A, Ap_A, Rd_A, Rd_exp_coeff,
+     WSC_min, Inhibition_max, K_Inhibition,
+     S_Vcmax25, SNmin_Vcmax25, S_Jmax25, SNmin_Jmax25, S_TPU25, SNmin_TPU25, S_Rdark25, SNmin_Rdark25, S_alpha, beta,
+     dHa_Kc, dHa_Ko, dHa_Gamma, dHa_Vcmax, dHa_Jmax, dHa_TPU, dHa_Rdark,
+     dHd_Vcmax, dHd_Jmax, dHd_TPU, dS_Vcmax, dS_Jmax, dS_TPU,
+     fdn_Vcmax, fdn_Jmax, fdn_TPU,
+     Tref, inv_R_kJ, KELVIN_DEGREE) = constants
+
+    #: RuBisCO parameters dependance to temperature (factor indices follow model._KC to model._RDARK)
+    Gamma = GAMMA25 * temperature_factors[2]
+
+    #: Mitochondrial respiration rate of organ in light Rd (processes other than photorespiration)
+    Rdark25 = S_Rdark25 * (surfacic_nitrogen - SNmin_Rdark25)  #: Relation between Rdark25 (respiration in obscurity at 25 degree C) and surfacic_nitrogen (�mol m-2 s-1)
+    Rdark = Rdark25 * temperature_factors[6]  #: Relation between Rdark and temperature (�mol m-2 s-1)
+    Rd = Rdark * (Rd_A + (1 - Rd_A) * exp(PAR * Rd_exp_coeff))  # Found in Muller et al. (2005), eq. 19, with Rd_B ** (PAR / Rd_C) as a single exp (�mol m-2 s-1)
+
+    Vc_max25 = S_Vcmax25 * (surfacic_nitrogen - SNmin_Vcmax25)  #: Relation between Vc_max25 and surfacic_nonstructural_nitrogen (�mol m-2 s-1)
+
+    #: Early exit: at night J and thus Aj are zero, and when Ci <= Gamma or the element is
+    #: nitrogen-starved (Vc_max25 <= 0) Ac is non-positive; either way the Ag <= 0 clamp
+    #: below would zero Ag and An, so the rest of the FCB math can be skipped
+    if PAR == 0 or Vc_max25 * (Ci - Gamma) <= 0:
+        return 0., 0., Rd
+
+    Kc = KC25 * temperature_factors[0]
+    Ko = KO25 * temperature_factors[1]
+
+    #: RuBisCO-limited carboxylation rate
+    Vc_max = Vc_max25 * temperature_factors[3]  #: Relation between Vc_max and temperature (�mol m-2 s-1)
+    Kc_eff = Kc * (1 + O2 / Ko)  #: Effective Michaelis constant of RuBisCO for CO2 in presence of O2 (�mol mol-1)
+    Ac = (Vc_max * (Ci - Gamma)) / (Ci + Kc_eff)  #: Rate of assimilation under Vc_max limitation (�mol m-2 s-1)
+
+    #: RuBP regeneration-limited carboxylation rate via electron transport
+    ALPHA = S_alpha * surfacic_nitrogen + beta  #: Relation between ALPHA and surfacic_nitrogen (mol e- mol-1 photon)
+    Jmax25 = S_Jmax25 * (surfacic_nitrogen - SNmin_Jmax25)  #: Relation between Jmax25 and surfacic_nitrogen (�mol m-2 s-1)
+    Jmax = Jmax25 * temperature_factors[4]  #: Relation between Jmax and temperature (�mol m-2 s-1)
+
+    J = ((Jmax + ALPHA * PAR) - sqrt((Jmax + ALPHA * PAR) ** J_expo - J_A * THETA * ALPHA * PAR * Jmax)) / (
+            J_B * THETA)  #: Electron transport rate (Muller et al. (2005), Evers et al. (2010)) (�mol m-2 s-1)
+    Aj = (J * (Ci - Gamma)) / (Aj_A * Ci + Aj_B * Gamma)  #: Rate of assimilation under RuBP regeneration limitation (�mol m-2 s-1)
+
+    #: Triose phosphate utilisation-limited carboxylation rate --- NOT USED, calculated just for information
+    TPU25 = S_TPU25 * (surfacic_nitrogen - SNmin_TPU25)  #: Relation between TPU25 and surfacic_nitrogen (�mol m-2 s-1)
+    TPU = TPU25 * temperature_factors[5]  #: Relation between TPU and temperature (�mol m-2 s-1)
+    Vomax_O2 = (Vc_max * Ko * Gamma) / (Vomax_A * Kc)  #: Maximum rate of Vo times O2 (the O2 factors of Vomax and Vo cancel out) (�mol m-2 s-1 �mol mol-1)
+    Vo = Vomax_O2 / (O2 + Ko * (1 + Ci / Kc))  #: Rate of oxygenation of RuBP (�mol m-2 s-1)
+    Ap = (1 - Gamma / Ci) * (Ap_A * TPU + Vo)  #: Rate of assimilation under TPU limitation (�mol m-2 s-1)
+
+    #: Gross assimilation rate (�mol m-2 s-1)
+    if NSC_Retroinhibition:
+        #: Relative diminution of Ag due to inhibition by NSC. Adapted from Azcon-Bieto 1983
+        if surfacic_NSC <= WSC_min:
+            inhibition = 0.
+        else:
+            inhibition = Inhibition_max * (surfacic_NSC - WSC_min) / (K_Inhibition + surfacic_NSC - WSC_min)
+            if inhibition > 1.:
+                inhibition = 1.
+        Ag = (Ac if Ac < Aj else Aj) * (1 - inhibition)
+    else:
+        Ag = Ac if Ac < Aj else Aj
+        if Ap < Ag:
+            Ag = Ap
+
+    #: Net C assimilation (�mol m-2 s-1)
+    if Ag <= 0:  # Occurs when the inhibition by NSC is total
+        Ag, An = 0., 0.
+    else:
+        An = Ag - Rd
+
+    return Ag, An, Rd
+
+
+@njit(cache=True, fastmath=True)
+def _solve_Ci_kernel(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, ambient_CO2, RH, m, Ci_init, xtol,
+                     temperature_factors, constants, GSMIN, GB, K_Cs, gsw_gs_CO2, Ci_A):
+    """Root-solve of the CO2 balance for Ci at fixed organ temperature, by the same
+    safeguarded secant method as :func:`farquharwheat.model._solve_Ci`.
+
+    :param float m: scaling factor of the stomatal conductance, delta1 * surfacic_nitrogen ** delta2 (dimensionless)
+    :param float Ci_init: initial estimate of Ci (�mol mol-1)
+    :param float xtol: absolute tolerance on Ci (�mol mol-1)
+    :param numpy.ndarray temperature_factors: the temperature-response factors at the organ temperature
+
+    :return: Ci (�mol mol-1) and the matching Ag, An, Rd (�mol m-2 s-1) and gsw (mol m-2 s-1)
+    :rtype: (float, float, float, float, float)
+    """
+    Ci_prev = Ci_init
+    Ag, An, Rd = _photosynthesis_kernel(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, Ci_prev, temperature_factors, constants)
+    Cs = ambient_CO2 - An * (K_Cs / GB)  #: CO2 concentration at organ surface (�mol mol-1)
+    gsw = GSMIN + m * ((Ag * RH) / Cs)  #: Stomatal conductance to water vapour (mol m-2 s-1)
+    F_prev = Ci_prev - (ambient_CO2 - An * ((gsw_gs_CO2 / gsw) + (Ci_A / GB)))
+    if F_prev == 0:
+        return Ci_prev, Ag, An, Rd, gsw
+    Ci = Ci_prev - F_prev  # First secant seed: quasi-Newton step with unit slope, kept positive
+    if Ci < Ci_prev / 2:
+        Ci = Ci_prev / 2
+
+    final_residual_needed = True
+    for _ in range(15):
+        Ag, An, Rd = _photosynthesis_kernel(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, Ci, temperature_factors, constants)
+        Cs = ambient_CO2 - An * (K_Cs / GB)
+        gsw = GSMIN + m * ((Ag * RH) / Cs)
+        F = Ci - (ambient_CO2 - An * ((gsw_gs_CO2 / gsw) + (Ci_A / GB)))
+        if F == 0 or abs(Ci - Ci_prev) < xtol:
+            final_residual_needed = False
+            break
+        denominator = F - F_prev
+        if denominator == 0:
+            final_residual_needed = False
+            break
+        Ci_next = Ci - F * (Ci - Ci_prev) / denominator
+        if Ci_next <= 0:
+            Ci_next = Ci / 2  # Keep the iterate physical; Ci = 0 would make Ap singular
+        Ci_prev, F_prev = Ci, F
+        Ci = Ci_next
+    if final_residual_needed:
+        # Make the returned rates consistent with the returned Ci
+        Ag, An, Rd = _photosynthesis_kernel(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, Ci, temperature_factors, constants)
+        Cs = ambient_CO2 - An * (K_Cs / GB)
+        gsw = GSMIN + m * ((Ag * RH) / Cs)
+
+    return Ci, Ag, An, Rd, gsw
+
+
+@njit(cache=True, fastmath=True)
+def _run_kernel(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, Ta, ambient_CO2, RH,
+                rbh, rbw, ra, Rn, VPDa, temperature_factors, constants, run_constants):
+    """The full coupled (Ci, Ts) fixed-point loop of :func:`farquharwheat.model.run`,
+    compiled as a single native function when Numba is installed: outer iteration on the
+    organ temperature with Aitken acceleration, inner secant root-solve on Ci, and the
+    Penman-Monteith energy balance with the static terms precomputed by
+    :func:`farquharwheat.model._organ_temperature_static`.
+
+    :param numpy.ndarray temperature_factors: preallocated array of length 7, overwritten
+        at each organ temperature with the temperature-response factors of the
+        photosynthetic parameters
+
+    :return: Ag, An, Rd (�mol m-2 s-1), Tr (mm s-1), Ts (degree C), gsw (mol m-2 s-1),
+        the previous iterate of Ts (degree C, for the non-convergence report) and True if Ts converged
+    :rtype: (float, float, float, float, float, float, float, bool)
+    """
+    (KC25, KO25, GAMMA25, O2, THETA,
+     J_expo, J_A, J_B, Aj_A, Aj_B, Vomax_A, Ap_A, Rd_A, Rd_exp_coeff,
+     WSC_min, Inhibition_max, K_Inhibition,
+     S_Vcmax25, SNmin_Vcmax25, S_Jmax25, SNmin_Jmax25, S_TPU25, SNmin_TPU25, S_Rdark25, SNmin_Rdark25, S_alpha, beta,
+     dHa_Kc, dHa_Ko, dHa_Gamma, dHa_Vcmax, dHa_Jmax, dHa_TPU, dHa_Rdark,
+     dHd_Vcmax, dHd_Jmax, dHd_TPU, dS_Vcmax, dS_Jmax, dS_TPU,
+     fdn_Vcmax, fdn_Jmax, fdn_TPU,
+     Tref, inv_R_kJ, KELVIN_DEGREE) = constants
+
+    (GSMIN, GB, K_Cs, gsw_gs_CO2, Ci_A, delta1, delta2,
+     R, PATM, s_A, s_B, s_C, RHOCP, LAMBDA, GAMMA_PSY, DELTA_CONVERGENCE, Ci_init_ratio) = run_constants
+
+    m = delta1 * surfacic_nitrogen ** delta2  #: Scaling factor of gsw, invariant across the iteration (dimensionless)
+    xtol = DELTA_CONVERGENCE * ambient_CO2  #: absolute tolerance on Ci (�mol mol-1)
+
+    Ci, Ts = Ci_init_ratio * ambient_CO2, Ta  # Initial values
+    count = 0
+    Ts_iterates_len = 1  #: number of stored iterates of the last Ts updates, for Aitken extrapolation
+    Ts_0 = Ts
+    Ts_1 = Ts
+    Ag = An = Rd = Tr = gsw = 0.
+    prec_Ts = Ts
+    converged = True
+
+    while True:
+        prec_Ts = Ts
+
+        #: Temperature-response factors of the photosynthetic parameters, computed once per Ts
+        #: and reused by every residual evaluation of the inner Ci root-solve
+        Tk = Ts + KELVIN_DEGREE
+        temperature_factors[0] = _f_temp_activation_only(1., dHa_Kc, Tk, Tref, inv_R_kJ)
+        temperature_factors[1] = _f_temp_activation_only(1., dHa_Ko, Tk, Tref, inv_R_kJ)
+        temperature_factors[2] = _f_temp_activation_only(1., dHa_Gamma, Tk, Tref, inv_R_kJ)
+        temperature_factors[3] = _f_temp_with_deact(1., dHa_Vcmax, dHd_Vcmax, dS_Vcmax, fdn_Vcmax, Tk, Tref, inv_R_kJ)
+        temperature_factors[4] = _f_temp_with_deact(1., dHa_Jmax, dHd_Jmax, dS_Jmax, fdn_Jmax, Tk, Tref, inv_R_kJ)
+        temperature_factors[5] = _f_temp_with_deact(1., dHa_TPU, dHd_TPU, dS_TPU, fdn_TPU, Tk, Tref, inv_R_kJ)
+        temperature_factors[6] = _f_temp_activation_only(1., dHa_Rdark, Tk, Tref, inv_R_kJ)
+
+        Ci, Ag, An, Rd, gsw = _solve_Ci_kernel(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, ambient_CO2, RH, m, Ci, xtol,
+                                               temperature_factors, constants, GSMIN, GB, K_Cs, gsw_gs_CO2, Ci_A)
+
+        #: New value of Ts: transpiration (mm s-1) then organ temperature, Penman-Monteith.
+        #: The slope of the curve relating saturation vapour pressure to temperature (kPa K-1) is the
+        #: analytic derivative of the Tetens formula at the midpoint temperature, which is exact for
+        #: Ts == Ta and does not cancel catastrophically when Ts gets close to Ta near convergence
+        T_mid = 0.5 * (Ts + Ta)
+        es_mid = s_C * exp((s_B * T_mid) / (s_A + T_mid))  #: Saturated vapour pressure at midpoint temperature (kPa)
+        s = ((s_B * s_A) / (s_A + T_mid) ** 2) * es_mid  #: the square comes from differentiating the Tetens exponent, not from parameters.s_expo
+
+        gsw_physic = (gsw * R * (Ts + KELVIN_DEGREE)) / PATM  #: Stomatal conductance to water in physical units (m s-1)
+        rswp = 1 / gsw_physic  #: Stomatal resistance for water (s m-1)
+        Tr = (s * Rn + (RHOCP * VPDa) / (rbh + ra)) / (LAMBDA * (s + GAMMA_PSY * ((rbw + ra + rswp) / (rbh + ra))))  #: mm s-1
+        if Tr < 0.:
+            Tr = 0.
+        Ts = Ta + ((rbh + ra) * (Rn - LAMBDA * Tr)) / RHOCP
+        count += 1
+
+        if count >= 10:
+            if prec_Ts != 0 and abs((Ts - prec_Ts) / prec_Ts) >= DELTA_CONVERGENCE:
+                converged = False
+            break
+        if (prec_Ts == 0 and (Ts - prec_Ts) == 0) or (prec_Ts != 0 and abs((Ts - prec_Ts) / prec_Ts) < DELTA_CONVERGENCE):
+            break
+
+        # Steffensen acceleration: after every two Ts updates, replace the iterate by the
+        # Aitken delta-squared extrapolation of the last three, which converges quadratically
+        # instead of linearly on smooth contractions. The extrapolated value seeds the next update.
+        if Ts_iterates_len == 1:
+            Ts_1 = Ts
+            Ts_iterates_len = 2
+        else:
+            denominator = Ts - 2 * Ts_1 + Ts_0
+            if abs(denominator) >= 1E-12:
+                Ts = Ts_0 - (Ts_1 - Ts_0) ** 2 / denominator
+            Ts_0 = Ts
+            Ts_iterates_len = 1
+
+    return Ag, An, Rd, Tr, Ts, gsw, prec_Ts, converged
@@ -1,6 +1,7 @@
 # -*- coding: latin-1 -*-
 
 from __future__ import division  # use "//" to do integer division
+import numpy as np
 import pandas as pd
 
 """
@@ -46,21 +47,34 @@ def from_dataframe(element_inputs, axes_inputs):
     seealso:: see :attr:`simulation.Simulation.inputs` and :attr:`simulation.Simulation.outputs`
        for the structure of Farquhar-Wheat inputs/outputs.
     """
-    all_elements_dict = {}
-    data_columns = element_inputs.columns.difference(ELEMENT_TOPOLOGY_COLUMNS)
-    for current_id, current_group in element_inputs.groupby(ELEMENT_TOPOLOGY_COLUMNS):
-        current_series = current_group.loc[current_group.first_valid_index()]
-        current_dict = current_series[data_columns].to_dict()
-        all_elements_dict[current_id] = current_dict
+    return {'elements': _first_row_per_topology(element_inputs, ELEMENT_TOPOLOGY_COLUMNS),
+            'axes': _first_row_per_topology(axes_inputs, AXIS_TOPOLOGY_COLUMNS)}
 
-    all_axes_dict = {}
-    data_columns = axes_inputs.columns.difference(AXIS_TOPOLOGY_COLUMNS)
-    for current_id, current_group in axes_inputs.groupby(AXIS_TOPOLOGY_COLUMNS):
-        current_series = current_group.loc[current_group.first_valid_index()]
-        current_dict = current_series[data_columns].to_dict()
-        all_axes_dict[current_id] = current_dict
 
-    return {'elements': all_elements_dict, 'axes': all_axes_dict}
+def _first_row_per_topology(inputs, topology_columns):
+    """
+    Return the dict {topology tuple: {column: value, ...}, ...} keeping, for each unique
+    topology tuple, the first row of `inputs` which carries it.
+
+    A stable :func:`numpy.lexsort` on the raw key columns finds the group boundaries
+    directly, which avoids the MultiIndex construction and hash-grouping of a pandas
+    groupby just to pick one row per group.
+    """
+    if not len(inputs):
+        return {}
+    data_columns = [column_name for column_name in inputs.columns if column_name not in topology_columns]
+    key_arrays = [inputs[column_name].to_numpy() for column_name in topology_columns]
+    data_arrays = [inputs[column_name].to_numpy() for column_name in data_columns]
+    order = np.lexsort(key_arrays[::-1])  # stable: ties keep their original row order
+    is_group_start = np.zeros(len(order), dtype=bool)
+    is_group_start[0] = True
+    for key_array in key_arrays:
+        sorted_keys = key_array[order]
+        is_group_start[1:] |= sorted_keys[1:] != sorted_keys[:-1]
+    first_row_indices = order[np.flatnonzero(is_group_start)]
+    return {tuple(key_array[row_index] for key_array in key_arrays):
+            {column_name: data_array[row_index] for column_name, data_array in zip(data_columns, data_arrays)}
+            for row_index in first_row_indices}
 
 
 def to_dataframe(data_dict):
@@ -75,11 +89,16 @@ def to_dataframe(data_dict):
     seealso:: see :attr:`simulation.Simulation.inputs` and :attr:`simulation.Simulation.outputs`
        for the structure of Farquhar-Wheat inputs/outputs.
     """
-    ids_df = pd.DataFrame(data_dict.keys(), columns=ELEMENT_TOPOLOGY_COLUMNS)
-    data_df = pd.DataFrame(data_dict.values())
-    df = pd.concat([ids_df, data_df], axis=1)
-    df.sort_values(by=ELEMENT_TOPOLOGY_COLUMNS, inplace=True)
-    columns_sorted = ELEMENT_TOPOLOGY_COLUMNS + [column_name for column_name in sorted(FARQUHARWHEAT_ELEMENTS_INPUTS_OUTPUTS) if column_name in df.columns]
-    df = df.reindex(columns_sorted, axis=1, copy=False)
-    df.reset_index(drop=True, inplace=True)
+    #: Build the dataframe column by column in its final order, instead of two intermediate
+    #: dataframes glued by pd.concat and reordered by reindex: one constructor call, no
+    #: block-alignment pass
+    ids = list(data_dict)
+    values = list(data_dict.values())
+    data_columns_present = set().union(*(value.keys() for value in values)) if values else set()
+    columns = {column_name: [id_[i] for id_ in ids] for i, column_name in enumerate(ELEMENT_TOPOLOGY_COLUMNS)}
+    for column_name in sorted(FARQUHARWHEAT_ELEMENTS_INPUTS_OUTPUTS):
+        if column_name in data_columns_present:
+            columns[column_name] = [value.get(column_name, float('nan')) for value in values]
+    df = pd.DataFrame(columns)
+    df.sort_values(by=ELEMENT_TOPOLOGY_COLUMNS, inplace=True, ignore_index=True)
     return df
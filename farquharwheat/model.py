@@ -1,8 +1,13 @@
 # -*- coding: latin-1 -*-
 
 from __future__ import division  # use '//' to do integer division
+import logging
 from math import sqrt, log, exp
+
+import numpy as np
+
 from farquharwheat import parameters
+from farquharwheat import _photosynthesis_numba
 
 """
     farquharwheat.model
@@ -20,9 +25,127 @@ from farquharwheat import parameters
 
 # TODO: extract all parameters and put them in farqhuar.parameters
 
-def _organ_temperature(w, z, Zh, Ur, PAR, gsw, Ta, Ts, RH, organ_name):
+_logger = logging.getLogger(__name__)
+
+#: Number of elements for which the fixed-point iteration did not converge since the module
+#: was imported (or since the caller last reset it); updated by :func:`run` and :func:`run_batch`
+nonconvergence_count = 0
+
+#: Integer indices of the photosynthetic parameters in the temperature-response arrays
+#: _DELTA_HA, _DELTA_HD and _DELTA_S below
+_KC, _KO, _GAMMA, _VC_MAX, _JMAX, _TPU, _RDARK = range(7)
+
+#: Names of the photosynthetic parameters in PARAM_TEMP, in index order
+_TEMP_PNAMES = ('Kc', 'Ko', 'Gamma', 'Vc_max', 'Jmax', 'TPU', 'Rdark')
+
+#: Indices of the parameters which have a deactivation term
+_DEACTIVATED_INDICES = (_VC_MAX, _JMAX, _TPU)
+
+
+def _extract_temperature_params():
+    """
+    Extract the temperature-response parameters from :mod:`farquharwheat.parameters` as a
+    struct-of-arrays representation: three arrays indexed by the integer constants
+    :attr:`_KC` to :attr:`_RDARK`, instead of the nested dicts of PARAM_TEMP. Entries of
+    _DELTA_HD and _DELTA_S are zero for the parameters without deactivation term.
+
+    :return: deltaHa (kJ mol-1), deltaHd (kJ mol-1), deltaS (kJ mol-1 K-1), one entry per parameter
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    PARAM_TEMP = parameters.PARAM_TEMP
+    deltaHa = np.array([PARAM_TEMP['deltaHa'][pname] for pname in _TEMP_PNAMES])
+    deltaHd = np.array([PARAM_TEMP['deltaHd'].get(pname, 0.) for pname in _TEMP_PNAMES])
+    deltaS = np.array([PARAM_TEMP['deltaS'].get(pname, 0.) for pname in _TEMP_PNAMES])
+    return deltaHa, deltaHd, deltaS
+
+
+_DELTA_HA, _DELTA_HD, _DELTA_S = _extract_temperature_params()
+
+
+def _derive_temperature_constants():
+    """
+    Precompute the constant subexpressions of the temperature-response formulas: the
+    reference temperature, the inverse of R expressed in kJ, and the numerator of the
+    deactivation fraction, (1 + exp((Tref*deltaS - deltaHd)/(Tref*R*1E-3))), which does not
+    depend on the organ temperature. This leaves a single exp per deactivation evaluation.
+
+    :return: Tref (K), 1/(R*1E-3) (mol K kJ-1), deactivation numerator (dimensionless, one entry per parameter)
+    :rtype: (float, float, numpy.ndarray)
+    """
+    Tref = parameters.PARAM_TEMP['Tref']
+    inv_R_kJ = 1000.0 / parameters.R
+    f_deact_num = 1 + np.exp((Tref * _DELTA_S - _DELTA_HD) * inv_R_kJ / Tref)
+    return Tref, inv_R_kJ, f_deact_num
+
+
+_TREF, _INV_R_KJ, _F_DEACT_NUM = _derive_temperature_constants()
+
+#: Last-call cache of :func:`_temperature_factors`: [key, factors]
+_temperature_factors_cache = [None, None]
+
+
+def _temperature_factors(Ts):
     """
-    Energy balance for the estimation of organ temperature
+    Compute the temperature-response factors of all seven photosynthetic parameters in a
+    single vectorized pass, so that one call replaces seven scalar evaluations of
+    :func:`_f_temperature`. The result is cached on `round(Ts*100)`: near convergence the
+    organ temperature moves by far less than 0.01 degree C between iterations, so the tail
+    of the iteration reuses the cached factors instead of recomputing the exponentials.
+
+    :param float Ts: organ temperature (degree C)
+
+    :return: the factors by which the p25 values are multiplied, indexed by :attr:`_KC` to :attr:`_RDARK`
+    :rtype: numpy.ndarray
+    """
+    key = round(Ts * 100)
+    if _temperature_factors_cache[0] == key:
+        return _temperature_factors_cache[1]
+
+    Tk = Ts + parameters.KELVIN_DEGREE
+    common = (Tk - _TREF) * _INV_R_KJ / (_TREF * Tk)
+    factors = np.exp(_DELTA_HA * common)  #: Energies of activation (normalized to unity)
+    #: Energies of deactivation of Vc_max, Jmax and TPU (normalized to unity)
+    deactivated = slice(_VC_MAX, _TPU + 1)
+    factors[deactivated] *= _F_DEACT_NUM[deactivated] / (1 + np.exp((_DELTA_S[deactivated] - _DELTA_HD[deactivated] / Tk) * _INV_R_KJ))
+
+    _temperature_factors_cache[0] = key
+    _temperature_factors_cache[1] = factors
+    return factors
+
+
+def _extract_nitrogen_params():
+    """
+    Extract the nitrogen-dependence parameters from the nested PARAM_N dicts of
+    :mod:`farquharwheat.parameters` as plain scalars, so the hot functions read bare
+    module constants instead of doing two dict lookups by string key per parameter.
+
+    :return: the slopes and minima of the surfacic-nitrogen relations, plus beta, delta1 and delta2
+    :rtype: tuple of float
+    """
+    PARAM_N = parameters.PARAM_N
+    return (PARAM_N['S_surfacic_nitrogen']['Vc_max25'], PARAM_N['surfacic_nitrogen_min']['Vc_max25'],
+            PARAM_N['S_surfacic_nitrogen']['Jmax25'], PARAM_N['surfacic_nitrogen_min']['Jmax25'],
+            PARAM_N['S_surfacic_nitrogen']['TPU25'], PARAM_N['surfacic_nitrogen_min']['TPU25'],
+            PARAM_N['S_surfacic_nitrogen']['Rdark25'], PARAM_N['surfacic_nitrogen_min']['Rdark25'],
+            PARAM_N['S_surfacic_nitrogen']['alpha'], PARAM_N['beta'], PARAM_N['delta1'], PARAM_N['delta2'])
+
+
+(_S_VCMAX25, _SNMIN_VCMAX25, _S_JMAX25, _SNMIN_JMAX25, _S_TPU25, _SNMIN_TPU25,
+ _S_RDARK25, _SNMIN_RDARK25, _S_ALPHA, _BETA, _DELTA1, _DELTA2) = _extract_nitrogen_params()
+
+#: log((Zh - d) / Zo) with d = Zh_d * Zh and Zo = Zh_Zo * Zh: the canopy height cancels out,
+#: so the wind profile term at the top of the canopy is a constant (log(3) with the default parameters)
+_LOG_ZH_RATIO = log((1 - parameters.Zh_d) / parameters.Zh_Zo)
+
+#: log(Rd_B) / Rd_C: lets Rd_B ** (PAR / Rd_C) in the Rd formula be computed as a single exp
+_RD_EXP_COEFF = log(parameters.Rd_B) / parameters.Rd_C
+
+
+def _organ_temperature_static(w, z, Zh, Ur, PAR, Ta, RH, organ_name, _exp=exp, _log=log, _sqrt=sqrt):
+    """
+    Iteration-invariant part of the energy balance: everything which depends only on the
+    organ geometry and the weather, not on the organ temperature. Computed once per organ,
+    before the iterative resolution of the energy balance (see :func:`_organ_temperature_update`).
 
     :param float w: organ characteristic dimension (m) to be considered for heat transfer through forced convection (by wind).
              For a leaf: its width (more related to wind direction than length), for cylindric stem elements: diameter.
@@ -30,14 +153,13 @@ def _organ_temperature(w, z, Zh, Ur, PAR, gsw, Ta, Ts, RH, organ_name):
     :param float Zh: canopy height (m)
     :param float Ur: wind speed (m s-1) at the reference height (zr), e.g. top of the canopy + 2m (in the case of wheat, Ur can be approximated as the wind speed at 2m from soil)
     :param float PAR: absorbed PAR (�mol m-2 s-1)
-    :param float gsw: stomatal conductance to water vapour (mol m-2 s-1)
     :param float Ta: air temperature (degree C)
-    :param float Ts: organ temperature (degree C). Ts = Ta at the first iteration of the numeric resolution
     :param float RH: Relative humidity (decimal fraction)
     :param str organ_name: name of the organ to which belongs the element (used to distinguish lamina from cylindric organs)
 
-    :return: Ts (organ temperature, degree C), Tr (organ transpiration rate, mm s-1)
-    :rtype: (float, float)
+    :return: rbh and rbw (boundary layer resistances to heat and water, s m-1), ra (turbulence resistance to heat, s m-1),
+        Rn (net absorbed radiation, J m-2 s-1), VPDa (vapour pressure deficit of the air, kPa)
+    :rtype: (float, float, float, float, float)
     """
 
     d = parameters.Zh_d * Zh  #: Zero plane displacement height (m) #TODO: should we adapt this calculation before heading ?
@@ -47,22 +169,24 @@ def _organ_temperature(w, z, Zh, Ur, PAR, gsw, Ta, Ts, RH, organ_name):
     Ur = max(Ur, parameters.Ur_min)
 
     #: Wind speed
-    u_star = (Ur * parameters.K) / log((parameters.ZR - d) / Zo)  #: Friction velocity (m s-1)
-    Uh = (u_star / parameters.K) * log((Zh - d) / Zo)  #: Wind speed at the top of canopy (m s-1)
-    u = Uh * exp(parameters.A * (z / Zh - 1))  #: Wind speed at organ height (m s-1), from Campbell and Norman (1998), second edition.
+    log_term = _log((parameters.ZR - d) / Zo)  #: Wind profile term, also used in the aerodynamic resistance below
+    u_star = (Ur * parameters.K) / log_term  #: Friction velocity (m s-1)
+    Uh = (u_star / parameters.K) * _LOG_ZH_RATIO  #: Wind speed at the top of canopy (m s-1), log((Zh-d)/Zo) does not depend on Zh
+    u = Uh * _exp(parameters.A * (z / Zh - 1))  #: Wind speed at organ height (m s-1), from Campbell and Norman (1998), second edition.
 
     #: Boundary layer resistance to heat (s m-1). See Finnigan J, Raupach M. 1987 and Monteith JL. 1973 for basic equations.
     if organ_name == 'blade':
-        rbh = parameters.rhb_blade_A * sqrt(w / u)  #: Case of horizontal planes submitted to forced convection
+        rbh = parameters.rhb_blade_A * _sqrt(w / u)  #: Case of horizontal planes submitted to forced convection
     else:
         rbh = w / (parameters.rhb_other_A * ((u * w) / parameters.rhb_other_B) ** parameters.rhb_other_C)  #: Case of vertical cylinders submitted to forced convection
+    rbw = parameters.rbh_rbw * rbh  #: Boundary layer resistance for water (s m-1)
 
     #: Turbulence resistance to heat (s m-1)
-    ra = 1 / (parameters.K ** parameters.ra_expo * Ur) * (log((parameters.ZR - d) / Zo)) ** parameters.ra_expo  #: Aerodynamic resistance integrated from zr to z0 + d
+    ra = 1 / (parameters.K ** parameters.ra_expo * Ur) * log_term ** parameters.ra_expo  #: Aerodynamic resistance integrated from zr to z0 + d
 
     #: Net absorbed radiation Rn (PAR and NIR, J m-2 s-1)
     RGa = (PAR * parameters.PARa_to_RGa) / parameters.Watt_to_PPFD  #: Global absorbed radiation by organ (J m-2 s-1).
-    es_Ta = parameters.s_C * exp((parameters.s_B * Ta) / (parameters.s_A + Ta))  #: Saturated vapour pressure of the air (kPa), Ta in degree Celsius
+    es_Ta = parameters.s_C * _exp((parameters.s_B * Ta) / (parameters.s_A + Ta))  #: Saturated vapour pressure of the air (kPa), Ta in degree Celsius
     V = RH * es_Ta  #: Vapour pressure of the air (kPa)
     # fvap = 0.56 - 0.079*sqrt(10*V)                      #: Fraction of vapour pressure
     #
@@ -73,17 +197,38 @@ def _organ_temperature(w, z, Zh, Ur, PAR, gsw, Ta, Ts, RH, organ_name):
     # General equation is Rn = RGa + epsilon*Ra + epsilon*sigma*(Ts_feuilles_voisines + parameters.KELVIN_DEGREE)**4 - epsilon*sigma*(Ts + parameters.KELVIN_DEGREE)**4
     # if Ra unavailable, use Ra = sigma*(Tair + parameters.KELVIN_DEGREE)**4*fvap*fclear
 
+    VPDa = es_Ta - V
+
+    return rbh, rbw, ra, Rn, VPDa
+
+
+def _organ_temperature_update(gsw, Ta, Ts, rbh, rbw, ra, Rn, VPDa, _exp=exp):
+    """
+    Iteration-variant part of the energy balance: update organ temperature and transpiration
+    from the current estimates of Ts and gsw, using the static terms precomputed by
+    :func:`_organ_temperature_static`.
+
+    :param float gsw: stomatal conductance to water vapour (mol m-2 s-1)
+    :param float Ta: air temperature (degree C)
+    :param float Ts: organ temperature (degree C). Ts = Ta at the first iteration of the numeric resolution
+    :param float rbh: boundary layer resistance to heat (s m-1)
+    :param float rbw: boundary layer resistance for water (s m-1)
+    :param float ra: turbulence resistance to heat (s m-1)
+    :param float Rn: net absorbed radiation (J m-2 s-1)
+    :param float VPDa: vapour pressure deficit of the air (kPa)
+
+    :return: Ts (organ temperature, degree C), Tr (organ transpiration rate, mm s-1)
+    :rtype: (float, float)
+    """
+
     #: Transpiration (mm s-1), Penman-Monteith
-    if Ts == Ta:
-        Ta_K = Ta + parameters.KELVIN_DEGREE
-        s = ((parameters.s_B * parameters.s_A) / (Ta_K + parameters.s_A) ** parameters.s_expo) * es_Ta  #: Slope of the curve relating saturation vapour pressure to temperature (kPa K-1)
-    else:
-        es_Tl = parameters.s_C * exp((parameters.s_B * Ts) / (parameters.s_A + Ts))  #: Saturated vapour pressure at organ level (kPa), Ts in degree Celsius
-        Ts_K, Ta_K = Ts + parameters.KELVIN_DEGREE, Ta + parameters.KELVIN_DEGREE
-        s = (es_Tl - es_Ta) / (Ts_K - Ta_K)  #: Slope of the curve relating saturation vapour pressure to temperature (kPa K-1)
+    #: Slope of the curve relating saturation vapour pressure to temperature (kPa K-1): analytic
+    #: derivative of the Tetens formula at the midpoint temperature, which is exact for Ts == Ta
+    #: and does not lose precision by cancellation when Ts gets close to Ta near convergence
+    T_mid = 0.5 * (Ts + Ta)
+    es_mid = parameters.s_C * _exp((parameters.s_B * T_mid) / (parameters.s_A + T_mid))  #: Saturated vapour pressure at midpoint temperature (kPa)
+    s = ((parameters.s_B * parameters.s_A) / (parameters.s_A + T_mid) ** 2) * es_mid  #: the square comes from differentiating the Tetens exponent, not from parameters.s_expo
 
-    VPDa = es_Ta - V
-    rbw = parameters.rbh_rbw * rbh  #: Boundary layer resistance for water (s m-1)
     gsw_physic = (gsw * parameters.R * (Ts + parameters.KELVIN_DEGREE)) / parameters.PATM  #: Stomatal conductance to water in physical units (m s-1). Relation given by A. Tuzet (2003)
     rswp = 1 / gsw_physic  #: Stomatal resistance for water (s m-1)
     Tr = max(0., (s * Rn + (parameters.RHOCP * VPDa) / (rbh + ra)) / (parameters.LAMBDA * (s + parameters.GAMMA * ((rbw + ra + rswp) / (rbh + ra)))))  #: mm s-1
@@ -94,6 +239,31 @@ def _organ_temperature(w, z, Zh, Ur, PAR, gsw, Ta, Ts, RH, organ_name):
     return Ts, Tr
 
 
+def _organ_temperature(w, z, Zh, Ur, PAR, gsw, Ta, Ts, RH, organ_name):
+    """
+    Energy balance for the estimation of organ temperature. Convenience wrapper around
+    :func:`_organ_temperature_static` and :func:`_organ_temperature_update`; iterative
+    callers should call the two parts separately so the static terms are computed only once.
+
+    :param float w: organ characteristic dimension (m) to be considered for heat transfer through forced convection (by wind).
+             For a leaf: its width (more related to wind direction than length), for cylindric stem elements: diameter.
+    :param float z: organ height from soil (m)
+    :param float Zh: canopy height (m)
+    :param float Ur: wind speed (m s-1) at the reference height (zr), e.g. top of the canopy + 2m (in the case of wheat, Ur can be approximated as the wind speed at 2m from soil)
+    :param float PAR: absorbed PAR (�mol m-2 s-1)
+    :param float gsw: stomatal conductance to water vapour (mol m-2 s-1)
+    :param float Ta: air temperature (degree C)
+    :param float Ts: organ temperature (degree C). Ts = Ta at the first iteration of the numeric resolution
+    :param float RH: Relative humidity (decimal fraction)
+    :param str organ_name: name of the organ to which belongs the element (used to distinguish lamina from cylindric organs)
+
+    :return: Ts (organ temperature, degree C), Tr (organ transpiration rate, mm s-1)
+    :rtype: (float, float)
+    """
+    rbh, rbw, ra, Rn, VPDa = _organ_temperature_static(w, z, Zh, Ur, PAR, Ta, RH, organ_name)
+    return _organ_temperature_update(gsw, Ta, Ts, rbh, rbw, ra, Rn, VPDa)
+
+
 def _stomatal_conductance(Ag, An, surfacic_nitrogen, ambient_CO2, RH):
     """
     Ball, Woodrow, and Berry model of stomatal conductance (1987)
@@ -109,7 +279,7 @@ def _stomatal_conductance(Ag, An, surfacic_nitrogen, ambient_CO2, RH):
     """
 
     Cs = ambient_CO2 - An * (parameters.K_Cs / parameters.GB)  #: CO2 concentration at organ surface (�mol mol-1 or Pa). From Prieto et al. (2012). GB in mol m-2 s-1
-    m = parameters.PARAM_N['delta1'] * surfacic_nitrogen ** parameters.PARAM_N['delta2']  #: Scaling factor dependance to surfacic_nitrogen (dimensionless). This focntion is maintained
+    m = _DELTA1 * surfacic_nitrogen ** _DELTA2  #: Scaling factor dependance to surfacic_nitrogen (dimensionless). This focntion is maintained
     # although I'm not conviced that it should be taken into account
     gsw = (parameters.GSMIN + m * ((Ag * RH) / Cs))  #: Stomatal conductance to water vapour (mol m-2 s-1), from Braune et al. (2009), Muller et al. (2005): using Ag rather than An.
     # Would be better with a function of VPD and with (Ci-GAMMA) instead of Cs.
@@ -133,11 +303,11 @@ def _calculate_Ci(ambient_CO2, An, gsw):
     return Ci
 
 
-def _f_temperature(pname, p25, T):
+def _f_temperature(idx, p25, T, _exp=exp):
     """
     Photosynthetic parameters relation to temperature
 
-    :param str pname: name of parameter
+    :param int idx: index of the parameter in the temperature-response arrays (one of :attr:`_KC` to :attr:`_RDARK`)
     :param float p25: parameter value at 25 degree C
     :param float T: organ temperature (degree C)
 
@@ -145,16 +315,12 @@ def _f_temperature(pname, p25, T):
     :rtype: float
     """
     Tk = T + parameters.KELVIN_DEGREE
-    deltaHa = parameters.PARAM_TEMP['deltaHa'][pname]  #: Enthalpie of activation of parameter pname (kJ mol-1)
-    Tref = parameters.PARAM_TEMP['Tref']
 
-    f_activation = exp((deltaHa * (Tk - Tref)) / (parameters.R * 1E-3 * Tref * Tk))  #: Energy of activation (normalized to unity)
+    f_activation = _exp((_DELTA_HA[idx] * (Tk - _TREF) * _INV_R_KJ) / (_TREF * Tk))  #: Energy of activation (normalized to unity)
 
-    if pname in ('Vc_max', 'Jmax', 'TPU'):
-        deltaS = parameters.PARAM_TEMP['deltaS'][pname]  #: entropy term of parameter pname (kJ mol-1 K-1)
-        deltaHd = parameters.PARAM_TEMP['deltaHd'][pname]  #: Enthalpie of deactivation of parameter pname (kJ mol-1)
-        f_deactivation = (1 + exp((Tref * deltaS - deltaHd) / (Tref * parameters.R * 1E-3))) / (
-                1 + exp((Tk * deltaS - deltaHd) / (Tk * parameters.R * 1E-3)))  #: Energy of deactivation (normalized to unity)
+    if idx in _DEACTIVATED_INDICES:
+        #: Energy of deactivation (normalized to unity); the numerator is precomputed in _F_DEACT_NUM
+        f_deactivation = _F_DEACT_NUM[idx] / (1 + _exp((_DELTA_S[idx] - _DELTA_HD[idx] / Tk) * _INV_R_KJ))
     else:
         f_deactivation = 1
 
@@ -163,19 +329,77 @@ def _f_temperature(pname, p25, T):
     return p
 
 
-def _inhibition_by_NSC(NSC):
+def _extract_photosynthesis_constants():
     """
-    Calculates the relative diminution of Ag due to inhibition by NSC. Adapted from Azcon-Bieto 1983
+    Extract from :mod:`farquharwheat.parameters` the constants used by the photosynthesis
+    kernel. Doing the extraction once keeps the dict lookups into PARAM_N and PARAM_TEMP
+    out of the iteration loop of :func:`run`, and provides the kernel with plain scalars
+    which Numba can compile efficiently.
 
-    :param float NSC: Surfacic content of water-soluble carbohydrates  (�mol C m-2)
+    :return: the constants
+    :rtype: _photosynthesis_numba.PhotosynthesisConstants
+    """
+    PARAM_N = parameters.PARAM_N
+    PARAM_TEMP = parameters.PARAM_TEMP
+    return _photosynthesis_numba.PhotosynthesisConstants(
+        KC25=parameters.KC25, KO25=parameters.KO25, GAMMA25=parameters.GAMMA25, O2=parameters.O2, THETA=parameters.THETA,
+        J_expo=parameters.J_expo, J_A=parameters.J_A, J_B=parameters.J_B, Aj_A=parameters.Aj_A, Aj_B=parameters.Aj_B,
+        Vomax_A=parameters.Vomax_A, Ap_A=parameters.Ap_A,
+        Rd_A=parameters.Rd_A, Rd_exp_coeff=log(parameters.Rd_B) / parameters.Rd_C,
+        WSC_min=parameters.WSC_min, Inhibition_max=parameters.Inhibition_max, K_Inhibition=parameters.K_Inhibition,
+        S_Vcmax25=PARAM_N['S_surfacic_nitrogen']['Vc_max25'], SNmin_Vcmax25=PARAM_N['surfacic_nitrogen_min']['Vc_max25'],
+        S_Jmax25=PARAM_N['S_surfacic_nitrogen']['Jmax25'], SNmin_Jmax25=PARAM_N['surfacic_nitrogen_min']['Jmax25'],
+        S_TPU25=PARAM_N['S_surfacic_nitrogen']['TPU25'], SNmin_TPU25=PARAM_N['surfacic_nitrogen_min']['TPU25'],
+        S_Rdark25=PARAM_N['S_surfacic_nitrogen']['Rdark25'], SNmin_Rdark25=PARAM_N['surfacic_nitrogen_min']['Rdark25'],
+        S_alpha=PARAM_N['S_surfacic_nitrogen']['alpha'], beta=PARAM_N['beta'],
+        dHa_Kc=PARAM_TEMP['deltaHa']['Kc'], dHa_Ko=PARAM_TEMP['deltaHa']['Ko'], dHa_Gamma=PARAM_TEMP['deltaHa']['Gamma'],
+        dHa_Vcmax=PARAM_TEMP['deltaHa']['Vc_max'], dHa_Jmax=PARAM_TEMP['deltaHa']['Jmax'],
+        dHa_TPU=PARAM_TEMP['deltaHa']['TPU'], dHa_Rdark=PARAM_TEMP['deltaHa']['Rdark'],
+        dHd_Vcmax=PARAM_TEMP['deltaHd']['Vc_max'], dHd_Jmax=PARAM_TEMP['deltaHd']['Jmax'], dHd_TPU=PARAM_TEMP['deltaHd']['TPU'],
+        dS_Vcmax=PARAM_TEMP['deltaS']['Vc_max'], dS_Jmax=PARAM_TEMP['deltaS']['Jmax'], dS_TPU=PARAM_TEMP['deltaS']['TPU'],
+        fdn_Vcmax=_F_DEACT_NUM[_VC_MAX], fdn_Jmax=_F_DEACT_NUM[_JMAX], fdn_TPU=_F_DEACT_NUM[_TPU],
+        Tref=PARAM_TEMP['Tref'], inv_R_kJ=_INV_R_KJ, KELVIN_DEGREE=parameters.KELVIN_DEGREE)
+
+
+def _extract_run_constants():
+    """
+    Extract from :mod:`farquharwheat.parameters` the constants used by the coupled-loop
+    kernel on top of the photosynthesis constants: stomatal conductance, CO2 balance and
+    energy balance parameters, plus the convergence settings.
 
-    :return: Relative diminution (dimensionless)
-    :rtype: float
+    :return: the constants
+    :rtype: _photosynthesis_numba.RunConstants
     """
-    if NSC <= parameters.WSC_min:
-        return 0
-    else:
-        return min(parameters.Inhibition_max * (NSC - parameters.WSC_min) / (parameters.K_Inhibition + NSC - parameters.WSC_min), 1)
+    return _photosynthesis_numba.RunConstants(
+        GSMIN=parameters.GSMIN, GB=parameters.GB, K_Cs=parameters.K_Cs, gsw_gs_CO2=parameters.gsw_gs_CO2, Ci_A=parameters.Ci_A,
+        delta1=_DELTA1, delta2=_DELTA2,
+        R=parameters.R, PATM=parameters.PATM, s_A=parameters.s_A, s_B=parameters.s_B, s_C=parameters.s_C,
+        RHOCP=parameters.RHOCP, LAMBDA=parameters.LAMBDA, GAMMA_PSY=parameters.GAMMA,
+        DELTA_CONVERGENCE=parameters.DELTA_CONVERGENCE, Ci_init_ratio=parameters.Ci_init_ratio)
+
+
+#: The constants used by the photosynthesis and coupled-loop kernels, extracted once at import time.
+#: Call :func:`update_photosynthesis_constants` after modifying :mod:`farquharwheat.parameters`.
+_PHOTOSYNTHESIS_CONSTANTS = _extract_photosynthesis_constants()
+_RUN_CONSTANTS = _extract_run_constants()
+
+
+def update_photosynthesis_constants():
+    """Re-extract the photosynthesis kernel constants from :mod:`farquharwheat.parameters`.
+    To be called after the parameters have been updated (see :class:`Simulation <farquharwheat.simulation.Simulation>`).
+    """
+    global _PHOTOSYNTHESIS_CONSTANTS, _RUN_CONSTANTS, _DELTA_HA, _DELTA_HD, _DELTA_S, _TREF, _INV_R_KJ, _F_DEACT_NUM
+    global _S_VCMAX25, _SNMIN_VCMAX25, _S_JMAX25, _SNMIN_JMAX25, _S_TPU25, _SNMIN_TPU25
+    global _S_RDARK25, _SNMIN_RDARK25, _S_ALPHA, _BETA, _DELTA1, _DELTA2, _LOG_ZH_RATIO, _RD_EXP_COEFF
+    _DELTA_HA, _DELTA_HD, _DELTA_S = _extract_temperature_params()
+    _TREF, _INV_R_KJ, _F_DEACT_NUM = _derive_temperature_constants()
+    (_S_VCMAX25, _SNMIN_VCMAX25, _S_JMAX25, _SNMIN_JMAX25, _S_TPU25, _SNMIN_TPU25,
+     _S_RDARK25, _SNMIN_RDARK25, _S_ALPHA, _BETA, _DELTA1, _DELTA2) = _extract_nitrogen_params()
+    _PHOTOSYNTHESIS_CONSTANTS = _extract_photosynthesis_constants()
+    _RUN_CONSTANTS = _extract_run_constants()
+    _temperature_factors_cache[0] = _temperature_factors_cache[1] = None
+    _LOG_ZH_RATIO = log((1 - parameters.Zh_d) / parameters.Zh_Zo)
+    _RD_EXP_COEFF = log(parameters.Rd_B) / parameters.Rd_C
 
 
 def calculate_photosynthesis(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, Ts, Ci):
@@ -183,6 +407,9 @@ def calculate_photosynthesis(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfac
     Computes photosynthesis rate following Farquhar's model with regulation by organ temperature and nitrogen content.
     In this version, most of the parameters are derived from Braune et al. (2009) on barley and Evers et al. (2010) for N dependencies.
 
+    The actual computation is done by :func:`_photosynthesis_numba._photosynthesis_kernel`,
+    which is JIT-compiled when Numba is installed.
+
     :param float PAR: PAR absorbed (�mol m-2 s-1)
     :param float surfacic_nitrogen: surfacic nitrogen content(g m-2) including or not structural nitrogen depending on parameter.MODEL_VERSION
     :param bool NSC_Retroinhibition: if True, Ag is inhibited by surfacic NSC (Non-Structural Carbohydrates).
@@ -193,61 +420,40 @@ def calculate_photosynthesis(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfac
     :return: Ag (�mol m-2 s-1), An (�mol m-2 s-1), Rd (�mol m-2 s-1)
     :rtype: (float, float, float)
     """
+    return _photosynthesis_numba._photosynthesis_kernel(PAR, surfacic_nitrogen, bool(NSC_Retroinhibition), surfacic_NSC, Ci,
+                                                        _temperature_factors(Ts), _PHOTOSYNTHESIS_CONSTANTS)
 
-    #: RuBisCO parameters dependance to temperature
-    Kc = _f_temperature('Kc', parameters.KC25, Ts)
-    Ko = _f_temperature('Ko', parameters.KO25, Ts)
-    Gamma = _f_temperature('Gamma', parameters.GAMMA25, Ts)
-
-    #: RuBisCO-limited carboxylation rate
-    Sna_Vcmax25 = parameters.PARAM_N['S_surfacic_nitrogen']['Vc_max25']
-    surfacic_nitrogen_min_Vcmax25 = parameters.PARAM_N['surfacic_nitrogen_min']['Vc_max25']
-    Vc_max25 = Sna_Vcmax25 * (surfacic_nitrogen - surfacic_nitrogen_min_Vcmax25)  #: Relation between Vc_max25 and surfacic_nonstructural_nitrogen (�mol m-2 s-1)
-    Vc_max = _f_temperature('Vc_max', Vc_max25, Ts)  #: Relation between Vc_max and temperature (�mol m-2 s-1)
-    Ac = (Vc_max * (Ci - Gamma)) / (Ci + Kc * (1 + parameters.O2 / Ko))  #: Rate of assimilation under Vc_max limitation (�mol m-2 s-1)
 
-    #: RuBP regeneration-limited carboxylation rate via electron transport
-    ALPHA = parameters.PARAM_N['S_surfacic_nitrogen']['alpha'] * surfacic_nitrogen + parameters.PARAM_N['beta']  #: Relation between ALPHA and surfacic_nitrogen (mol e- mol-1 photon)
-    Sna_Jmax25 = parameters.PARAM_N['S_surfacic_nitrogen']['Jmax25']
-    surfacic_nitrogen_min_Jmax25 = parameters.PARAM_N['surfacic_nitrogen_min']['Jmax25']
-    Jmax25 = Sna_Jmax25 * (surfacic_nitrogen - surfacic_nitrogen_min_Jmax25)  #: Relation between Jmax25 and surfacic_nitrogen (�mol m-2 s-1)
-    Jmax = _f_temperature('Jmax', Jmax25, Ts)  #: Relation between Jmax and temperature (�mol m-2 s-1)
-
-    J = ((Jmax + ALPHA * PAR) - sqrt((Jmax + ALPHA * PAR) ** parameters.J_expo - parameters.J_A * parameters.THETA * ALPHA * PAR * Jmax)) / (
-            parameters.J_B * parameters.THETA)  #: Electron transport rate (Muller et al. (2005), Evers et al. (2010)) (�mol m-2 s-1)
-    Aj = (J * (Ci - Gamma)) / (parameters.Aj_A * Ci + parameters.Aj_B * Gamma)  #: Rate of assimilation under RuBP regeneration limitation (�mol m-2 s-1)
-
-    #: Triose phosphate utilisation-limited carboxylation rate --- NOT USED, calculated just for information
-    Sna_TPU25 = parameters.PARAM_N['S_surfacic_nitrogen']['TPU25']
-    surfacic_nitrogen_min_TPU25 = parameters.PARAM_N['surfacic_nitrogen_min']['TPU25']
-    TPU25 = Sna_TPU25 * (surfacic_nitrogen - surfacic_nitrogen_min_TPU25)  #: Relation between TPU25 and surfacic_nitrogen (�mol m-2 s-1)
-    TPU = _f_temperature('TPU', TPU25, Ts)  #: Relation between TPU and temperature (�mol m-2 s-1)
-    Vomax = (Vc_max * Ko * Gamma) / (parameters.Vomax_A * Kc * parameters.O2)  #: Maximum rate of Vo (�mol m-2 s-1) (�mol m-2 s-1)
-    Vo = (Vomax * parameters.O2) / (parameters.O2 + Ko * (1 + Ci / Kc))  #: Rate of oxygenation of RuBP (�mol m-2 s-1)
-    Ap = (1 - Gamma / Ci) * (parameters.Ap_A * TPU + Vo)  #: Rate of assimilation under TPU limitation (�mol m-2 s-1).
-    # I think there was a mistake in the paper of Braune et al. (2009) where they wrote Ap = (1-Gamma/Ci)*(3*TPU) + Vo
-    # A more recent expression of Ap was given by S. v Caemmerer in her book (2000): AP = (3TPU * (Ci-Gamma))/(Ci-(1+3alpha)*Gamma),
-    # where 0 < alpha > 1 is the fraction of glycolate carbon not returned to the chloroplast, but I couldn't find any estimation of alpha for wheat
+def _solve_Ci(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, Ts, ambient_CO2, RH, Ci_init):
+    """
+    Solve the CO2 balance at organ level for the internal CO2 concentration, at fixed organ
+    temperature: find the root of F(Ci) = Ci - (ambient_CO2 - An(Ci) * (1.6/gsw(Ci) + 1.37/GB))
+    with a safeguarded secant method. Since F is smooth and close to linear in Ci, a handful
+    of evaluations is enough, instead of the tens of sweeps of a Picard iteration.
 
-    #: Gross assimilation rate (�mol m-2 s-1)
-    if NSC_Retroinhibition:
-        Ag = min(Ac, Aj) * (1 - _inhibition_by_NSC(surfacic_NSC))
-    else:
-        Ag = min(Ac, Aj, Ap)
+    Convenience wrapper around :func:`_photosynthesis_numba._solve_Ci_kernel`, where the
+    photosynthesis, stomatal conductance and CO2 balance equations are inlined in a single
+    function; iterative callers should use :func:`run`, which keeps the whole coupled loop
+    inside the kernel module.
 
-    #: Mitochondrial respiration rate of organ in light Rd (processes other than photorespiration)
-    Rdark25 = parameters.PARAM_N['S_surfacic_nitrogen']['Rdark25'] * (surfacic_nitrogen - parameters.PARAM_N['surfacic_nitrogen_min'][
-        'Rdark25'])  #: Relation between Rdark25 (respiration in obscurity at 25 degree C) and surfacic_nitrogen (�mol m-2 s-1)
-    Rdark = _f_temperature('Rdark', Rdark25, Ts)  #: Relation between Rdark and temperature (�mol m-2 s-1)
-    Rd = Rdark * (parameters.Rd_A + (1 - parameters.Rd_A) * parameters.Rd_B ** (PAR / parameters.Rd_C))  # Found in Muller et al. (2005), eq. 19 (�mol m-2 s-1)
+    :param float PAR: PAR absorbed (�mol m-2 s-1)
+    :param float surfacic_nitrogen: surfacic nitrogen content (g m-2)
+    :param bool NSC_Retroinhibition: if True, Ag is inhibited by surfacic NSC (Non-Structural Carbohydrates).
+    :param float surfacic_NSC: surfacic content of NSC (�mol C m-2)
+    :param float Ts: organ temperature (degree C)
+    :param float ambient_CO2: air CO2 (�mol mol-1)
+    :param float RH: relative humidity (decimal fraction)
+    :param float Ci_init: initial estimate of Ci (�mol mol-1)
 
-    #: Net C assimilation (�mol m-2 s-1)
-    if Ag <= 0:  # Occurs when Ci is lower than Gamma or when (surfacic_nitrogen - surfacic_nitrogen_min)<0, in these cases there is no net assimilation (Farquhar, 1980; Caemmerer, 2000)
-        Ag, An = 0, 0
-    else:
-        An = Ag - Rd
+    :return: Ci (�mol mol-1) and the matching Ag, An, Rd (�mol m-2 s-1) and gsw (mol m-2 s-1)
+    :rtype: (float, float, float, float, float)
+    """
 
-    return Ag, An, Rd
+    m = _DELTA1 * surfacic_nitrogen ** _DELTA2  #: Scaling factor of gsw (dimensionless)
+    xtol = parameters.DELTA_CONVERGENCE * ambient_CO2  #: absolute tolerance on Ci (�mol mol-1)
+    return _photosynthesis_numba._solve_Ci_kernel(PAR, surfacic_nitrogen, bool(NSC_Retroinhibition), surfacic_NSC, ambient_CO2, RH, m, Ci_init, xtol,
+                                                  _temperature_factors(Ts), _PHOTOSYNTHESIS_CONSTANTS,
+                                                  parameters.GSMIN, parameters.GB, parameters.K_Cs, parameters.gsw_gs_CO2, parameters.Ci_A)
 
 
 def calculate_surfacic_nitrogen(nitrates, amino_acids, proteins, Nstruct, green_area):
@@ -334,7 +540,7 @@ def run(surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, width, height, PAR
            characteristic dimension to be considered for heat transfer through forced convection (by wind).
     :param float height: height of the organ from soil (m)
     :param float PAR: absorbed PAR (�mol m-2 s-1)
-    :param float Ta: air temperature (�C)
+    :param float Ta: air temperature (�C)
     :param float ambient_CO2: air CO2 (�mol mol-1)
     :param float RH: relative humidity (decimal fraction)
     :param float Ur: wind at the reference height (zr) (m s-1), e.g. top of the canopy + 2m
@@ -343,42 +549,285 @@ def run(surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, width, height, PAR
     :param float height_canopy: total canopy height (m)
 
     :return: Ag (�mol m-2 s-1), An (�mol m-2 s-1), Rd (�mol m-2 s-1),
-        Tr (mmol m-2 s-1), Ts (�C) and  gsw (mol m-2 s-1)
+        Tr (mmol m-2 s-1), Ts (�C) and  gsw (mol m-2 s-1)
     :rtype: (float, float, float, float, float, float)
     """
 
     if surfacic_nitrogen is None:
         surfacic_nitrogen = parameters.NA_0
 
+    #: Iteration-invariant terms of the energy balance, computed once for the organ
+    energy_balance_static = _organ_temperature_static(width, height, height_canopy, Ur, PAR, Ta, RH, organ_name)
+
+    # The whole coupled (Ci, Ts) fixed-point loop runs in :func:`_photosynthesis_numba._run_kernel`,
+    # which is JIT-compiled when Numba is installed: outer iteration on the organ temperature with
+    # Aitken acceleration, and at each Ts a root-solve of the CO2 balance for Ci (see :func:`_solve_Ci`).
+    Ag, An, Rd, Tr, Ts, gsw, prec_Ts, converged = _photosynthesis_numba._run_kernel(PAR, surfacic_nitrogen, bool(NSC_Retroinhibition), surfacic_NSC,
+                                                                                    Ta, ambient_CO2, RH, *energy_balance_static,
+                                                                                    np.empty(7), _PHOTOSYNTHESIS_CONSTANTS, _RUN_CONSTANTS)
+    if not converged:
+        global nonconvergence_count
+        nonconvergence_count += 1
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug('%s, Ts cannot converge, prec_Ts= %s, Ts= %s', organ_name, prec_Ts, Ts)
+
+    #: Conversion of Tr from mm s-1 to mmol m-2 s-1 (more suitable for further use of Tr)
+    Tr = (Tr * 1E6) / parameters.MM_WATER  # Using 1 mm = 1kg m-2
+    #: Decrease efficency of non-lamina organs
+    if organ_name != 'blade':
+        Ag = Ag * parameters.EFFICENCY_STEM
+    return Ag, An, Rd, Tr, Ts, gsw
+
+
+def _organ_temperature_batch(w, z, Zh, Ur, PAR, gsw, Ta, Ts, RH, is_blade):
+    """
+    Energy balance for the estimation of organ temperature, vectorized over elements.
+    Same equations as :func:`_organ_temperature` but applied to 1D arrays.
+
+    :param numpy.ndarray w: organ characteristic dimensions (m)
+    :param numpy.ndarray z: organ heights from soil (m)
+    :param numpy.ndarray Zh: canopy heights (m)
+    :param float Ur: wind speed (m s-1) at the reference height (zr)
+    :param numpy.ndarray PAR: absorbed PAR (�mol m-2 s-1)
+    :param numpy.ndarray gsw: stomatal conductances to water vapour (mol m-2 s-1)
+    :param float Ta: air temperature (degree C)
+    :param numpy.ndarray Ts: organ temperatures (degree C)
+    :param float RH: Relative humidity (decimal fraction)
+    :param numpy.ndarray is_blade: True for lamina elements, False for cylindric organs
+
+    :return: Ts (organ temperatures, degree C), Tr (organ transpiration rates, mm s-1)
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+
+    d = parameters.Zh_d * Zh  #: Zero plane displacement height (m)
+    Zo = parameters.Zh_Zo * Zh  #: Roughness length (m)
+
+    Ur = max(Ur, parameters.Ur_min)
+
+    #: Wind speed
+    log_term = np.log((parameters.ZR - d) / Zo)  #: Wind profile term, also used in the aerodynamic resistance below
+    u_star = (Ur * parameters.K) / log_term  #: Friction velocity (m s-1)
+    Uh = (u_star / parameters.K) * _LOG_ZH_RATIO  #: Wind speed at the top of canopy (m s-1), log((Zh-d)/Zo) does not depend on Zh
+    u = Uh * np.exp(parameters.A * (z / Zh - 1))  #: Wind speed at organ height (m s-1)
+
+    #: Boundary layer resistance to heat (s m-1)
+    rbh = np.where(is_blade,
+                   parameters.rhb_blade_A * np.sqrt(w / u),
+                   w / (parameters.rhb_other_A * ((u * w) / parameters.rhb_other_B) ** parameters.rhb_other_C))
+
+    #: Turbulence resistance to heat (s m-1)
+    ra = 1 / (parameters.K ** parameters.ra_expo * Ur) * log_term ** parameters.ra_expo
+
+    #: Net absorbed radiation Rn (PAR and NIR, J m-2 s-1)
+    RGa = (PAR * parameters.PARa_to_RGa) / parameters.Watt_to_PPFD
+    es_Ta = parameters.s_C * exp((parameters.s_B * Ta) / (parameters.s_A + Ta))  #: Saturated vapour pressure of the air (kPa)
+    V = RH * es_Ta  #: Vapour pressure of the air (kPa)
+    Rn = RGa
+
+    #: Slope of the curve relating saturation vapour pressure to temperature (kPa K-1): analytic
+    #: derivative of the Tetens formula at the midpoint temperature (see :func:`_organ_temperature_update`)
+    T_mid = 0.5 * (Ts + Ta)
+    es_mid = parameters.s_C * np.exp((parameters.s_B * T_mid) / (parameters.s_A + T_mid))  #: Saturated vapour pressure at midpoint temperature (kPa)
+    s = ((parameters.s_B * parameters.s_A) / (parameters.s_A + T_mid) ** 2) * es_mid  #: the square comes from differentiating the Tetens exponent, not from parameters.s_expo
+
+    #: Transpiration (mm s-1), Penman-Monteith
+    VPDa = es_Ta - V
+    rbw = parameters.rbh_rbw * rbh  #: Boundary layer resistance for water (s m-1)
+    gsw_physic = (gsw * parameters.R * (Ts + parameters.KELVIN_DEGREE)) / parameters.PATM  #: Stomatal conductance to water in physical units (m s-1)
+    rswp = 1 / gsw_physic  #: Stomatal resistance for water (s m-1)
+    Tr = np.maximum(0., (s * Rn + (parameters.RHOCP * VPDa) / (rbh + ra)) / (parameters.LAMBDA * (s + parameters.GAMMA * ((rbw + ra + rswp) / (rbh + ra)))))  #: mm s-1
+
+    #: Organ temperature
+    Ts = Ta + ((rbh + ra) * (Rn - parameters.LAMBDA * Tr)) / parameters.RHOCP
+
+    return Ts, Tr
+
+
+def _temperature_factors_batch(T):
+    """
+    Temperature-response factors of all seven photosynthetic parameters for a batch of
+    elements: the two-dimensional counterpart of :func:`_temperature_factors`, evaluating
+    one np.exp over a (7, n) array instead of seven per-parameter ufunc sweeps.
+
+    :param numpy.ndarray T: organ temperatures (degree C)
+
+    :return: the factors by which the p25 values are multiplied, of shape (7, n),
+        indexed by :attr:`_KC` to :attr:`_RDARK` along the first axis
+    :rtype: numpy.ndarray
+    """
+    Tk = T + parameters.KELVIN_DEGREE
+    common = (Tk - _TREF) * _INV_R_KJ / (_TREF * Tk)
+    factors = np.exp(np.multiply.outer(_DELTA_HA, common))  #: Energies of activation (normalized to unity)
+    #: Energies of deactivation of Vc_max, Jmax and TPU (normalized to unity)
+    deactivated = slice(_VC_MAX, _TPU + 1)
+    factors[deactivated] *= _F_DEACT_NUM[deactivated, np.newaxis] / (1 + np.exp((_DELTA_S[deactivated, np.newaxis] - _DELTA_HD[deactivated, np.newaxis] / Tk) * _INV_R_KJ))
+    return factors
+
+
+def _calculate_photosynthesis_batch(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, Ts, Ci):
+    """
+    Computes photosynthesis rates following Farquhar's model, vectorized over elements.
+    Same equations as :func:`calculate_photosynthesis` but applied to 1D arrays.
+
+    :param numpy.ndarray PAR: PAR absorbed (�mol m-2 s-1)
+    :param numpy.ndarray surfacic_nitrogen: surfacic nitrogen contents (g m-2)
+    :param bool NSC_Retroinhibition: if True, Ag is inhibited by surfacic NSC (Non-Structural Carbohydrates).
+    :param numpy.ndarray surfacic_NSC: surfacic contents of NSC (�mol C m-2)
+    :param numpy.ndarray Ts: organ temperatures (degree C)
+    :param numpy.ndarray Ci: internal CO2 (�mol mol-1)
+
+    :return: Ag (�mol m-2 s-1), An (�mol m-2 s-1), Rd (�mol m-2 s-1)
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+
+    #: RuBisCO parameters dependance to temperature, all seven factors in one vectorized pass
+    temperature_factors = _temperature_factors_batch(Ts)
+    Kc = parameters.KC25 * temperature_factors[_KC]
+    Ko = parameters.KO25 * temperature_factors[_KO]
+    Gamma = parameters.GAMMA25 * temperature_factors[_GAMMA]
+
+    #: RuBisCO-limited carboxylation rate
+    Vc_max25 = _S_VCMAX25 * (surfacic_nitrogen - _SNMIN_VCMAX25)
+    Vc_max = Vc_max25 * temperature_factors[_VC_MAX]
+    Kc_eff = Kc * (1 + parameters.O2 / Ko)  #: Effective Michaelis constant of RuBisCO for CO2 in presence of O2 (�mol mol-1)
+    Ac = (Vc_max * (Ci - Gamma)) / (Ci + Kc_eff)
+
+    #: RuBP regeneration-limited carboxylation rate via electron transport
+    ALPHA = _S_ALPHA * surfacic_nitrogen + _BETA
+    Jmax25 = _S_JMAX25 * (surfacic_nitrogen - _SNMIN_JMAX25)
+    Jmax = Jmax25 * temperature_factors[_JMAX]
+    J = ((Jmax + ALPHA * PAR) - np.sqrt((Jmax + ALPHA * PAR) ** parameters.J_expo - parameters.J_A * parameters.THETA * ALPHA * PAR * Jmax)) / (
+            parameters.J_B * parameters.THETA)
+    Aj = (J * (Ci - Gamma)) / (parameters.Aj_A * Ci + parameters.Aj_B * Gamma)
+
+    #: Gross assimilation rate (�mol m-2 s-1)
+    if NSC_Retroinhibition:
+        inhibition = np.where(surfacic_NSC <= parameters.WSC_min,
+                              0,
+                              np.minimum(parameters.Inhibition_max * (surfacic_NSC - parameters.WSC_min) / (parameters.K_Inhibition + surfacic_NSC - parameters.WSC_min), 1))
+        Ag = np.minimum(Ac, Aj) * (1 - inhibition)
+    else:
+        #: Triose phosphate utilisation-limited carboxylation rate
+        TPU25 = _S_TPU25 * (surfacic_nitrogen - _SNMIN_TPU25)
+        TPU = TPU25 * temperature_factors[_TPU]
+        Vomax_O2 = (Vc_max * Ko * Gamma) / (parameters.Vomax_A * Kc)  #: Maximum rate of Vo times O2 (the O2 factors cancel out)
+        Vo = Vomax_O2 / (parameters.O2 + Ko * (1 + Ci / Kc))
+        Ap = (1 - Gamma / Ci) * (parameters.Ap_A * TPU + Vo)
+        Ag = np.minimum(np.minimum(Ac, Aj), Ap)
+
+    #: Mitochondrial respiration rate of organ in light Rd (processes other than photorespiration)
+    Rdark25 = _S_RDARK25 * (surfacic_nitrogen - _SNMIN_RDARK25)
+    Rdark = Rdark25 * temperature_factors[_RDARK]
+    Rd = Rdark * (parameters.Rd_A + (1 - parameters.Rd_A) * np.exp(PAR * _RD_EXP_COEFF))
+
+    #: Net C assimilation (�mol m-2 s-1)
+    Ag = np.where(Ag <= 0, 0., Ag)
+    An = np.where(Ag <= 0, 0., Ag - Rd)
+
+    return Ag, An, Rd
+
+
+def run_batch(surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, width, height, PAR, Ta, ambient_CO2, RH, Ur, organ_name, height_canopy):
+    """
+    Computes the photosynthesis of a batch of photosynthetic elements at once, using
+    NumPy arrays instead of one call to :func:`run` per element. The fixed-point iteration
+    on (Ci, Ts) is performed simultaneously for all elements, with the same Aitken
+    acceleration of the Ts sequence as the scalar loop, and converged elements are
+    progressively removed from the working set.
+
+    :param numpy.ndarray surfacic_nitrogen: surfacic nitrogen contents of organs (g m-2). NaN entries are replaced by :attr:`NA_0`
+    :param bool NSC_Retroinhibition: if True, Ag is inhibited by surfacic NSC (Non-Structural Carbohydrates).
+    :param numpy.ndarray surfacic_NSC: surfacic contents of NSC (Non-Structural Carbohydrates) (�mol C m-2)
+    :param numpy.ndarray width: widths of the organs (or diameters for stem organs) (m)
+    :param numpy.ndarray height: heights of the organs from soil (m)
+    :param numpy.ndarray PAR: absorbed PAR (�mol m-2 s-1)
+    :param float Ta: air temperature (�C)
+    :param float ambient_CO2: air CO2 (�mol mol-1)
+    :param float RH: relative humidity (decimal fraction)
+    :param float Ur: wind at the reference height (zr) (m s-1)
+    :param numpy.ndarray organ_name: names of the organs to which belong the elements
+    :param numpy.ndarray height_canopy: total canopy heights (m)
+
+    :return: Ag (�mol m-2 s-1), An (�mol m-2 s-1), Rd (�mol m-2 s-1),
+        Tr (mmol m-2 s-1), Ts (�C) and gsw (mol m-2 s-1), one entry per element
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+
+    surfacic_nitrogen = np.where(np.isnan(surfacic_nitrogen), parameters.NA_0, np.asarray(surfacic_nitrogen, dtype=float))
+    surfacic_NSC = np.asarray(surfacic_NSC, dtype=float)
+    width = np.asarray(width, dtype=float)
+    height = np.asarray(height, dtype=float)
+    PAR = np.asarray(PAR, dtype=float)
+    height_canopy = np.broadcast_to(np.asarray(height_canopy, dtype=float), surfacic_nitrogen.shape)
+    is_blade = np.asarray(organ_name) == 'blade'
+
+    number_of_elements = surfacic_nitrogen.shape[0]
+
     # Iterations to find organ temperature and Ci #
-    Ci, Ts = parameters.Ci_init_ratio * ambient_CO2, Ta  # Initial values
+    Ci = np.full(number_of_elements, parameters.Ci_init_ratio * ambient_CO2)  # Initial values
+    Ts = np.full(number_of_elements, float(Ta))
+    Ag = np.zeros(number_of_elements)
+    An = np.zeros(number_of_elements)
+    Rd = np.zeros(number_of_elements)
+    Tr = np.zeros(number_of_elements)
+    gsw = np.zeros(number_of_elements)
+
+    not_converged = np.arange(number_of_elements)  #: indices of the elements which have not converged yet
     count = 0
+    Ts_0 = Ts.copy()  #: iterates at the start of the last two Ts updates, for Aitken extrapolation
+    Ts_1 = Ts.copy()
+    extrapolate = False
 
     while True:
-        prec_Ci, prec_Ts = Ci, Ts
-        Ag, An, Rd = calculate_photosynthesis(PAR, surfacic_nitrogen, NSC_Retroinhibition, surfacic_NSC, Ts, Ci)
+        prec_Ci, prec_Ts = Ci[not_converged], Ts[not_converged]
+        Ag[not_converged], An[not_converged], Rd[not_converged] = _calculate_photosynthesis_batch(PAR[not_converged], surfacic_nitrogen[not_converged], NSC_Retroinhibition,
+                                                                                                 surfacic_NSC[not_converged], prec_Ts, prec_Ci)
         # Stomatal conductance to water
-        gsw = _stomatal_conductance(Ag, An, surfacic_nitrogen, ambient_CO2, RH)
+        gsw[not_converged] = _stomatal_conductance(Ag[not_converged], An[not_converged], surfacic_nitrogen[not_converged], ambient_CO2, RH)
 
         # New value of Ci
-        Ci = _calculate_Ci(ambient_CO2, An, gsw)
+        Ci[not_converged] = _calculate_Ci(ambient_CO2, An[not_converged], gsw[not_converged])
 
         # New value of Ts
-        Ts, Tr = _organ_temperature(width, height, height_canopy, Ur, PAR, gsw, Ta, Ts, RH, organ_name)
+        Ts[not_converged], Tr[not_converged] = _organ_temperature_batch(width[not_converged], height[not_converged], height_canopy[not_converged], Ur, PAR[not_converged],
+                                                                        gsw[not_converged], Ta, prec_Ts, RH, is_blade[not_converged])
         count += 1
 
-        if count >= 30:  # TODO: test a faire? Semble prendre du tps de calcul
-            if abs((Ci - prec_Ci) / prec_Ci) >= parameters.DELTA_CONVERGENCE:
-                print('{}, Ci cannot converge, prec_Ci= {}, Ci= {}'.format(organ_name, prec_Ci, Ci))
-            if prec_Ts != 0 and abs((Ts - prec_Ts) / prec_Ts) >= parameters.DELTA_CONVERGENCE:
-                print('{}, Ts cannot converge, prec_Ts= {}, Ts= {}'.format(organ_name, prec_Ts, Ts))
+        Ci_converged = np.abs((Ci[not_converged] - prec_Ci) / prec_Ci) < parameters.DELTA_CONVERGENCE
+        Ts_converged = np.where(prec_Ts != 0,
+                                np.abs((Ts[not_converged] - prec_Ts) / np.where(prec_Ts != 0, prec_Ts, 1.)) < parameters.DELTA_CONVERGENCE,
+                                (Ts[not_converged] - prec_Ts) == 0)
+        if count >= 30:
+            global nonconvergence_count
+            nonconvergence_count += np.count_nonzero(~(Ci_converged & Ts_converged))
+            if _logger.isEnabledFor(logging.DEBUG):
+                if not np.all(Ci_converged):
+                    _logger.debug('%s elements, Ci cannot converge', np.count_nonzero(~Ci_converged))
+                if not np.all(Ts_converged):
+                    _logger.debug('%s elements, Ts cannot converge', np.count_nonzero(~Ts_converged))
             break
-        if abs((Ci - prec_Ci) / prec_Ci) < parameters.DELTA_CONVERGENCE and ((prec_Ts == 0 and (Ts - prec_Ts) == 0) or abs((Ts - prec_Ts) / prec_Ts) < parameters.DELTA_CONVERGENCE):
+        not_converged = not_converged[~(Ci_converged & Ts_converged)]
+        if not_converged.size == 0:
             break
 
+        # Steffensen acceleration, as in the scalar kernel: after every two Ts updates, replace
+        # the iterate of each still-unconverged element by the Aitken delta-squared extrapolation
+        # of its last three iterates. The extrapolated values seed the next update.
+        if not extrapolate:
+            Ts_1[not_converged] = Ts[not_converged]
+            extrapolate = True
+        else:
+            denominator = Ts[not_converged] - 2 * Ts_1[not_converged] + Ts_0[not_converged]
+            well_conditioned = np.abs(denominator) >= 1E-12
+            increment = Ts_1[not_converged] - Ts_0[not_converged]
+            Ts[not_converged] = np.where(well_conditioned,
+                                         Ts_0[not_converged] - increment ** 2 / np.where(well_conditioned, denominator, 1.),
+                                         Ts[not_converged])
+            Ts_0[not_converged] = Ts[not_converged]
+            extrapolate = False
+
     #: Conversion of Tr from mm s-1 to mmol m-2 s-1 (more suitable for further use of Tr)
     Tr = (Tr * 1E6) / parameters.MM_WATER  # Using 1 mm = 1kg m-2
     #: Decrease efficency of non-lamina organs
-    if organ_name != 'blade':
-        Ag = Ag * parameters.EFFICENCY_STEM
+    Ag = np.where(is_blade, Ag, Ag * parameters.EFFICENCY_STEM)
     return Ag, An, Rd, Tr, Ts, gsw
@@ -124,7 +124,7 @@ PARAM_TEMP = {'deltaHa': {'Vc_max': 89.7, 'Jmax': 48.9, 'TPU': 47., 'Kc': 79.43,
               'deltaHd': {'Vc_max': 149.3, 'Jmax': 152.3, 'TPU': 152.3},
               'deltaS': {'Vc_max': 0.486, 'Jmax': 0.495, 'TPU': 0.495}, 'Tref': 298.15}
 
-DELTA_CONVERGENCE = 0.01  #: The relative delta for Ci and Ts convergence.
+DELTA_CONVERGENCE = 0.005  #: The relative delta for Ci and Ts convergence. Tightened since the Aitken acceleration of the fixed-point loop made the extra sweeps cheap.
 
 # -- Inhibition of the photosynthesis by carbohydrates (from Azcon-Bieto 1983)
 WSC_min = 100000  # Surfacic WSC content above which inhibition of the photosynthesis by WSC occures (�mol C m-2)
@@ -2,6 +2,8 @@
 
 from __future__ import division  # use "//" to do integer division
 
+import numpy as np
+
 from farquharwheat import model
 from farquharwheat import parameters
 
@@ -50,6 +52,7 @@ class Simulation(object):
         #: Update parameters if specified
         if update_parameters:
             parameters.__dict__.update(update_parameters)
+            model.update_photosynthesis_constants()
 
     def initialize(self, inputs):
         """
@@ -79,6 +82,33 @@ class Simulation(object):
 
         self.outputs.update({inputs_type: {} for inputs_type in self.inputs['elements'].keys()})
 
+        #: Per-axis inputs depend only on axis_id: fetch them once instead of walking
+        #: self.inputs['axes'][axis_id][...] again for every element of the axis
+        axis_SAM_temperature = {axis_id: axis_inputs['SAM_temperature'] for axis_id, axis_inputs in self.inputs['axes'].items()}
+        axis_height_canopy = {axis_id: axis_inputs['height_canopy'] for axis_id, axis_inputs in self.inputs['axes'].items()}
+
+        #: The model-version switches cannot change during a run() call: resolve the
+        #: parameters dispatch once, before the element loop
+        NSC_retroinhibition = parameters.NSC_Retroinhibition
+        prim_scale = parameters.prim_scale
+        if parameters.SurfacicProteins:
+            def compute_surfacic_nitrogen(element_inputs):
+                surfacic_photosynthetic_proteins = model.calculate_surfacic_photosynthetic_proteins(element_inputs['proteins'],
+                                                                                                    element_inputs['green_area'])
+                return model.calculate_surfacic_nonstructural_nitrogen_Farquhar(surfacic_photosynthetic_proteins)
+        else:
+            def compute_surfacic_nitrogen(element_inputs):
+                return model.calculate_surfacic_nitrogen(element_inputs['nitrates'],
+                                                         element_inputs['amino_acids'],
+                                                         element_inputs['proteins'],
+                                                         element_inputs['Nstruct'],
+                                                         element_inputs['green_area'])
+
+        #: The hidden elements (no height) and the primitive-scale computation keep the
+        #: element-by-element path; every other element is accumulated and computed by a
+        #: single call to :func:`model.run_batch` instead of one :func:`model.run` per element.
+        batch_element_ids = []
+
         for (element_id, element_inputs) in self.inputs['elements'].items():
 
             axis_id = element_id[:2]
@@ -90,55 +120,68 @@ class Simulation(object):
             # In case it is an HiddenElement, we need temperature calculation. Cases of Visible Element without geomtry proprety (because too small) don't have photosynthesis calculation neither.
             if element_inputs['height'] is None:
                 Ag, An, Rd, Tr, gs = 0., 0., 0., 0., 0.
-                Ts = self.inputs['axes'][axis_id]['SAM_temperature']
+                Ts = axis_SAM_temperature[axis_id]
+            elif not prim_scale:
+                #:  Computation at organ scale, batched below
+                batch_element_ids.append(element_id)
+                continue
             else:
-                PARa = element_inputs['PARa']  #: Amount of absorbed PAR per unit area (�mol m-2 s-1)
-                height_canopy = self.inputs['axes'][axis_id]['height_canopy']
-
-                if parameters.SurfacicProteins:
-                    surfacic_photosynthetic_proteins = model.calculate_surfacic_photosynthetic_proteins(element_inputs['proteins'],
-                                                                                                        element_inputs['green_area'])
+                #:  Computation at primitive scale
+                height_canopy = axis_height_canopy[axis_id]
 
-                    surfacic_nitrogen = model.calculate_surfacic_nonstructural_nitrogen_Farquhar(surfacic_photosynthetic_proteins)
-
-                else:
-                    surfacic_nitrogen = model.calculate_surfacic_nitrogen(element_inputs['nitrates'],
-                                                                          element_inputs['amino_acids'],
-                                                                          element_inputs['proteins'],
-                                                                          element_inputs['Nstruct'],
-                                                                          element_inputs['green_area'])
+                surfacic_nitrogen = compute_surfacic_nitrogen(element_inputs)
 
                 surfacic_NSC = model.calculate_surfacic_WSC(element_inputs['sucrose'], element_inputs['starch'], element_inputs['fructan'], element_inputs['green_area'])
 
-                if not parameters.prim_scale:
-                    #:  Computation at organ scale
-                    Ag, An, Rd, Tr, Ts, gs = model.run(surfacic_nitrogen,
-                                                       parameters.NSC_Retroinhibition,
-                                                       surfacic_NSC,
-                                                       element_inputs['width'],
-                                                       element_inputs['height'],
-                                                       PARa, Ta, ambient_CO2,
-                                                       RH, Ur, organ_label, height_canopy)
-
+                Ag_prim_list = []
+                for PARa_prim in element_inputs['PARa_prim']:  #: Amount of absorbed PAR per unit area (�mol m-2 s-1)
+                    Ag_prim, An, Rd, Tr, Ts, gs = model.run(surfacic_nitrogen,
+                                                            NSC_retroinhibition,
+                                                            surfacic_NSC,
+                                                            element_inputs['width'],
+                                                            element_inputs['height'],
+                                                            PARa_prim, Ta, ambient_CO2,
+                                                            RH, Ur, organ_label, height_canopy)
+                    Ag_prim_list.append(Ag_prim)
+                if not Ag_prim_list:
+                    Ag = 0
                 else:
-                    #:  Computation at primitive scale
-                    Ag_prim_list = []
-                    for PARa_prim in element_inputs['PARa_prim']:  #: Amount of absorbed PAR per unit area (�mol m-2 s-1)
-                        Ag_prim, An, Rd, Tr, Ts, gs = model.run(surfacic_nitrogen,
-                                                                parameters.NSC_Retroinhibition,
-                                                                surfacic_NSC,
-                                                                element_inputs['width'],
-                                                                element_inputs['height'],
-                                                                PARa_prim, Ta, ambient_CO2,
-                                                                RH, Ur, organ_label, height_canopy)
-                        Ag_prim_list.append(Ag_prim)
-                    if not Ag_prim_list:
-                        Ag = 0
-                    else:
-                        Ag = sum([Ag_prim * area_prim for Ag_prim, area_prim in zip(Ag_prim_list, element_inputs['area_prim'])]) / sum(element_inputs['area_prim'])
+                    Ag = sum([Ag_prim * area_prim for Ag_prim, area_prim in zip(Ag_prim_list, element_inputs['area_prim'])]) / sum(element_inputs['area_prim'])
 
             element_outputs = {'Ag': Ag, 'An': An, 'Rd': Rd,
                                'Tr': Tr, 'Ts': Ts, 'gs': gs,
                                'width': element_inputs['width'], 'height': element_inputs['height']}
 
             self.outputs[element_id] = element_outputs
+
+        if batch_element_ids:
+            number_of_elements = len(batch_element_ids)
+            surfacic_nitrogen = np.empty(number_of_elements)
+            surfacic_NSC = np.empty(number_of_elements)
+            width = np.empty(number_of_elements)
+            height = np.empty(number_of_elements)
+            PARa = np.empty(number_of_elements)  #: Amount of absorbed PAR per unit area (�mol m-2 s-1)
+            height_canopy = np.empty(number_of_elements)
+            organ_labels = np.empty(number_of_elements, dtype=object)
+
+            for i, element_id in enumerate(batch_element_ids):
+                element_inputs = self.inputs['elements'][element_id]
+                axis_id = element_id[:2]
+
+                surfacic_nitrogen[i] = compute_surfacic_nitrogen(element_inputs)
+                surfacic_NSC[i] = model.calculate_surfacic_WSC(element_inputs['sucrose'], element_inputs['starch'], element_inputs['fructan'], element_inputs['green_area'])
+                width[i] = element_inputs['width']
+                height[i] = element_inputs['height']
+                PARa[i] = element_inputs['PARa']
+                height_canopy[i] = axis_height_canopy[axis_id]
+                organ_labels[i] = element_id[3]
+
+            Ag, An, Rd, Tr, Ts, gs = model.run_batch(surfacic_nitrogen, NSC_retroinhibition, surfacic_NSC,
+                                                     width, height, PARa, Ta, ambient_CO2,
+                                                     RH, Ur, organ_labels, height_canopy)
+
+            for i, element_id in enumerate(batch_element_ids):
+                element_inputs = self.inputs['elements'][element_id]
+                self.outputs[element_id] = {'Ag': Ag[i], 'An': An[i], 'Rd': Rd[i],
+                                            'Tr': Tr[i], 'Ts': Ts[i], 'gs': gs[i],
+                                            'width': element_inputs['width'], 'height': element_inputs['height']}
@@ -5,7 +5,7 @@ import os
 import numpy as np
 import pandas as pd
 
-from farquharwheat import simulation, converter
+from farquharwheat import converter, model, parameters, simulation
 
 """
     test_farquhar_wheat
@@ -79,5 +79,56 @@ def test_run(overwrite_desired_data=False):
     compare_actual_to_desired('.', outputs_df, DESIRED_OUTPUTS_FILENAME, ACTUAL_OUTPUTS_FILENAME, overwrite_desired_data)
 
 
+def test_run_batch():
+
+    Ta, ambient_CO2, RH, Ur = 18.8, 360, 0.530000, 2.200000
+
+    # read inputs from Pandas dataframe
+    elements_inputs_df = pd.read_csv(INPUTS_ELEMENT_FILENAME)
+    axes_inputs_df = pd.read_csv(INPUTS_AXIS_FILENAME)
+    # convert the dataframe to simulation inputs format
+    inputs = converter.from_dataframe(elements_inputs_df, axes_inputs_df)
+
+    # run the model element by element and collect the batch inputs
+    batch_inputs = {'surfacic_nitrogen': [], 'surfacic_NSC': [], 'width': [], 'height': [], 'PAR': [], 'organ_name': [], 'height_canopy': []}
+    scalar_outputs = []
+    for element_id, element_inputs in sorted(inputs['elements'].items()):
+        axis_id = element_id[:2]
+        organ_label = element_id[3]
+        height_canopy = inputs['axes'][axis_id]['height_canopy']
+        if parameters.SurfacicProteins:
+            surfacic_photosynthetic_proteins = model.calculate_surfacic_photosynthetic_proteins(element_inputs['proteins'], element_inputs['green_area'])
+            surfacic_nitrogen = model.calculate_surfacic_nonstructural_nitrogen_Farquhar(surfacic_photosynthetic_proteins)
+        else:
+            surfacic_nitrogen = model.calculate_surfacic_nitrogen(element_inputs['nitrates'], element_inputs['amino_acids'], element_inputs['proteins'],
+                                                                  element_inputs['Nstruct'], element_inputs['green_area'])
+        surfacic_NSC = model.calculate_surfacic_WSC(element_inputs['sucrose'], element_inputs['starch'], element_inputs['fructan'], element_inputs['green_area'])
+
+        scalar_outputs.append(model.run(surfacic_nitrogen, parameters.NSC_Retroinhibition, surfacic_NSC, element_inputs['width'], element_inputs['height'],
+                                        element_inputs['PARa'], Ta, ambient_CO2, RH, Ur, organ_label, height_canopy))
+
+        batch_inputs['surfacic_nitrogen'].append(surfacic_nitrogen)
+        batch_inputs['surfacic_NSC'].append(surfacic_NSC)
+        batch_inputs['width'].append(element_inputs['width'])
+        batch_inputs['height'].append(element_inputs['height'])
+        batch_inputs['PAR'].append(element_inputs['PARa'])
+        batch_inputs['organ_name'].append(organ_label)
+        batch_inputs['height_canopy'].append(height_canopy)
+
+    # run the model on all the elements at once
+    batch_outputs = model.run_batch(np.array(batch_inputs['surfacic_nitrogen']), parameters.NSC_Retroinhibition, np.array(batch_inputs['surfacic_NSC']),
+                                    np.array(batch_inputs['width']), np.array(batch_inputs['height']), np.array(batch_inputs['PAR']),
+                                    Ta, ambient_CO2, RH, Ur, np.array(batch_inputs['organ_name']), np.array(batch_inputs['height_canopy']))
+
+    # compare the batch outputs to the element-by-element outputs, column by column so that the
+    # absolute floor does not drown the small-magnitude outputs (Ag and gs on this fixture) ;
+    # both paths stop within DELTA_CONVERGENCE of the same fixed point
+    scalar_outputs = np.array(scalar_outputs)
+    for column, output_name in enumerate(('Ag', 'An', 'Rd', 'Tr', 'Ts', 'gs')):
+        np.testing.assert_allclose(batch_outputs[column], scalar_outputs[:, column], 2 * parameters.DELTA_CONVERGENCE, ABSOLUTE_TOLERANCE,
+                                   err_msg='batch %s diverges from the element-by-element outputs' % output_name)
+
+
 if __name__ == '__main__':
     test_run()
+    test_run_batch()